@@ -14,36 +14,43 @@
 # Env:
 #   Create .env in same folder:
 #     GROQ_API_KEY=your_key_here
+#
+# Optional:
+#   python -m pip install sentence-transformers   (enables semantic cache)
 # ------------------------------------------------------------
 
+import io
+import codecs
 import os
 import re
+import csv
 import json
 import time
+import random
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import pandas as pd
 import streamlit as st
-from dotenv import load_dotenv
 
-# ---- Optional Groq client (you likely already have this pattern in your repo) ----
+# Heavy / optional deps (pandas, groq, httpx, dotenv, sentence-transformers)
+# are imported lazily where they are used to keep cold start fast.
+
+# ---- Optional fast JSON (falls back to stdlib json) ----
 try:
-    from groq import Groq
+    import orjson
 except Exception:
-    Groq = None  # We'll handle gracefully
+    orjson = None
 
 
 # =========================
 # Page config + CSS
 # =========================
-st.set_page_config(
-    page_title="SceneSense AI",
-    page_icon="🎬",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
-
 CUSTOM_CSS = """
 <style>
 /* ---------- Global ---------- */
@@ -131,12 +138,58 @@ section[data-testid="stSidebar"] { border-right: 1px solid rgba(255,255,255,0.08
 .smallnote { font-size: 12px; opacity: 0.75; }
 </style>
 """
-st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+def setup_page():
+    # called from main() so `from app import analyze_scene` (verify_models.py) has no UI side effects
+    st.set_page_config(
+        page_title="SceneSense AI",
+        page_icon="🎬",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 
 # =========================
 # Helpers
 # =========================
+_RE_FENCE = re.compile(r"```(json)?", re.IGNORECASE)
+_RE_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_RE_HEX3 = re.compile(r"^#?([0-9a-fA-F]{3})$")
+_RE_HEX6 = re.compile(r"^#?([0-9a-fA-F]{6})$")
+_SCENE_HEADS = ("INT.", "EXT.", "INT/EXT.", "I/E.")
+
+
+def json_loads(s: Any) -> Any:
+    return orjson.loads(s) if orjson is not None else json.loads(s)
+
+
+def json_dump_bytes(data: Any, indent: bool = False) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            pass  # e.g. non-str keys -> stdlib handles them
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+
+def rows_to_csv_bytes(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Writes dict rows straight to UTF-8 CSV bytes (column order = first-seen keys).
+    """
+    fields: Dict[str, None] = {}
+    for r in rows:
+        fields.update(dict.fromkeys(r))
+    buf = io.BytesIO()
+    text = io.TextIOWrapper(buf, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(text, fieldnames=list(fields), restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+    text.detach()  # keep buf open
+    return buf.getvalue()
+
+
 def now_stamp() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -166,50 +219,138 @@ def normalize_hex(h: str) -> str:
     if not h:
         return "#111111"
     h = h.strip()
-    if not h.startswith("#"):
-        h = "#" + h
-    # keep #RRGGBB if possible
-    if len(h) == 4:  # #RGB -> expand
-        h = "#" + "".join([c * 2 for c in h[1:]])
-    if len(h) != 7:
-        return "#111111"
-    return h
+    m = _RE_HEX6.match(h)
+    if m:
+        return "#" + m.group(1).lower()
+    m = _RE_HEX3.match(h)
+    if m:  # #RGB -> expand
+        g = m.group(1).lower()
+        return "#" + g[0] * 2 + g[1] * 2 + g[2] * 2
+    return "#111111"
+
+
+class _BraceScanner:
+    """
+    Incremental, string-literal aware scanner for the first top-level {...} block.
+    feed() can be called chunk by chunk (e.g. while streaming).
+    """
+
+    __slots__ = ("depth", "start", "in_string", "escape", "pos")
+
+    def __init__(self):
+        self.depth = 0
+        self.start = -1  # absolute offset of the opening "{"
+        self.in_string = False
+        self.escape = False
+        self.pos = 0
+
+    def feed(self, chunk: str) -> int:
+        """
+        Returns the offset in chunk just past the closing "}", or -1 if not closed yet.
+        """
+        for i, c in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                if self.depth > 0:
+                    self.in_string = True
+            elif c == "{":
+                if self.depth == 0:
+                    self.start = self.pos + i
+                self.depth += 1
+            elif c == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.pos += i + 1
+                    return i + 1
+        self.pos += len(chunk)
+        return -1
+
+
+def _find_json_object(s: str) -> Optional[str]:
+    """
+    Returns the first balanced top-level {...} block in s (string-literal aware), or None.
+    """
+    scanner = _BraceScanner()
+    end = scanner.feed(s)
+    return s[scanner.start:end] if end >= 0 else None
 
 
 def extract_json_loose(text: str) -> Optional[Dict[str, Any]]:
     """
     Tries to recover JSON from LLM responses that include extra text or code fences.
+    Each distinct candidate string is parsed at most once.
     """
     if not text:
         return None
-    # strip code fences
-    text2 = re.sub(r"```(json)?", "", text, flags=re.IGNORECASE).strip("` \n\t")
-    # try direct
-    try:
-        return json.loads(text2)
-    except Exception:
-        pass
+    tried = set()
 
-    # try find first { ... } block (greedy)
-    m = re.search(r"\{.*\}", text2, flags=re.DOTALL)
-    if not m:
-        return None
-    blob = m.group(0)
-    try:
-        return json.loads(blob)
-    except Exception:
-        # common fixes: trailing commas
-        blob2 = re.sub(r",(\s*[}\]])", r"\1", blob)
+    def attempt(candidate: str):
+        if candidate in tried:
+            return None
+        tried.add(candidate)
         try:
-            return json.loads(blob2)
+            return json_loads(candidate)
         except Exception:
             return None
 
+    # fast path: response is already plain JSON (the common case)
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        data = attempt(stripped)
+        if data is not None:
+            return data
+    # strip code fences
+    text2 = _RE_FENCE.sub("", text).strip("` \n\t")
+    # try direct
+    data = attempt(text2)
+    if data is not None:
+        return data
+
+    # try first balanced { ... } block (single left-to-right scan)
+    blob = _find_json_object(text2)
+    if not blob:
+        return None
+    data = attempt(blob)
+    if data is not None:
+        return data
+    # common fixes: trailing commas
+    return attempt(_RE_TRAILING_COMMA.sub(r"\1", blob))
 
-def scene_splitter(script_text: str) -> List[str]:
+
+def iter_scenes(lines: Iterable[str], max_scenes: Optional[int] = None) -> Iterator[str]:
+    """
+    Yields scenes (>= 60 chars) from an iterable of lines without line endings,
+    splitting on INT./EXT. headings. Stops consuming lines after max_scenes.
+    """
+    buf: List[str] = []
+    count = 0
+    for ln in lines:
+        if buf and ln.startswith(_SCENE_HEADS):
+            p = "\n".join(buf).strip()
+            if len(p) >= 60:
+                yield p
+                count += 1
+                if max_scenes and count >= max_scenes:
+                    return
+            buf = []
+        buf.append(ln)
+    if buf:
+        p = "\n".join(buf).strip()
+        if len(p) >= 60:
+            yield p
+
+
+def scene_splitter(script_text: str, max_scenes: Optional[int] = None) -> List[str]:
     """
     Basic screenplay splitter using INT./EXT. headings.
     If no headings found, returns [whole_text].
+    With max_scenes, scanning stops as soon as that many scenes are collected.
     """
     if not script_text or len(script_text.strip()) < 30:
         return []
@@ -217,120 +358,741 @@ def scene_splitter(script_text: str) -> List[str]:
     # Normalize line endings
     t = script_text.replace("\r\n", "\n").replace("\r", "\n")
 
-    # Split on scene headings like: INT. / EXT. / INT/EXT.
-    pattern = r"(?=^(?:INT\.|EXT\.|INT/EXT\.|I/E\.).*$)"
-    parts = re.split(pattern, t, flags=re.MULTILINE)
+    scenes = list(iter_scenes(t.split("\n"), max_scenes))
+    return scenes if scenes else [t.strip()]
 
-    scenes = []
-    for p in parts:
-        p = p.strip()
-        if len(p) >= 60:
-            scenes.append(p)
 
-    return scenes if scenes else [t.strip()]
+def _iter_decoded_lines(script_bytes: bytes) -> Iterator[str]:
+    """
+    Incrementally decodes UTF-8 bytes line by line (same line-ending rules as scene_splitter).
+    """
+    for piece in codecs.iterdecode(io.BytesIO(script_bytes), "utf-8", errors="ignore"):
+        piece = piece.removesuffix("\n").removesuffix("\r")
+        yield from piece.split("\r")
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def split_script_cached(script_bytes: bytes, max_scenes: Optional[int] = None) -> List[str]:
+    # Decode lazily so a capped split never materializes the whole script as str;
+    # tiny inputs and the no-heading fallback need the full text anyway.
+    if len(script_bytes.strip()) >= 30:
+        scenes = list(iter_scenes(_iter_decoded_lines(script_bytes), max_scenes))
+        if scenes:
+            return scenes
+    return scene_splitter(script_bytes.decode("utf-8", errors="ignore"), max_scenes)
 
 
 # =========================
-# Groq call (LLM)
+# Normalized analysis
 # =========================
-def build_prompt(scene_text: str, mode: str) -> str:
+@dataclass(frozen=True, slots=True)
+class PaletteEntry:
+    name: str
+    hex: str
+    usage: str
+
+
+@dataclass(frozen=True, slots=True)
+class Shot:
+    number: Optional[str]
+    shot_type: str
+    movement: str
+    framing: str
+    lighting: str
+    purpose: str
+
+    @property
+    def title(self) -> str:
+        return f"Shot {self.number} — {self.shot_type}" if self.number is not None else f"{self.shot_type}"
+
+
+@dataclass(frozen=True, slots=True)
+class WriterNotes:
+    emotional_beat: str
+    subtext: str
+    dialogue_suggestions: Tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class SceneAnalysis:
     """
-    Strict schema prompt so output is consistently structured.
-    Keep it short enough for speed but strict enough for JSON.
-    """
-    schema = {
-        "mode": "director|writer",
-        "emotion": "string",
-        "genre": "string",
-        "tone": "string",
-        "intensity": "integer 1-10",
-        "narrative_purpose": "string",
-        "visual_mood": "string",
-        "camera_style": "string",
-        "color_palette": [
-            {"name": "string", "hex": "#RRGGBB", "usage": "string"}
-        ],
-        "shot_list": [
-            {
-                "shot_number": "int",
-                "shot_type": "string (Wide/Medium/Close-up/OTS/POV etc.)",
-                "camera_movement": "string",
-                "framing": "string",
-                "lighting": "string",
-                "purpose": "string"
-            }
-        ],
-        "storyboard_prompts": ["string", "string", "string"],
-        "writer_notes": {
-            "emotional_beat": "string",
-            "subtext": "string",
-            "dialogue_suggestions": ["string"]
-        },
-        "confidence": "float 0-1"
-    }
+    LLM output normalized once (defaults, clamping, hex cleanup) for the renderers.
+    Frozen + tuples, so it is hashable and usable directly as a cache key.
+    """
+    emotion: str
+    genre: str
+    tone: str
+    intensity: int
+    confidence: float
+    narrative_purpose: str
+    visual_mood: str
+    camera_style: str
+    palette: Tuple[PaletteEntry, ...]
+    shots: Tuple[Shot, ...]
+    storyboard_prompts: Tuple[str, ...]
+    writer_notes: Optional[WriterNotes]
+
+    @classmethod
+    def from_raw(cls, data: Dict[str, Any]) -> "SceneAnalysis":
+        palette = safe_get(data, "color_palette", []) or []
+        shots = safe_get(data, "shot_list", []) or []
+        prompts = safe_get(data, "storyboard_prompts", []) or []
+        wn = safe_get(data, "writer_notes", {}) or {}
+
+        notes = None
+        if isinstance(wn, dict) and wn:
+            sugg = safe_get(wn, "dialogue_suggestions", []) or []
+            notes = WriterNotes(
+                emotional_beat=str(safe_get(wn, "emotional_beat", "—")),
+                subtext=str(safe_get(wn, "subtext", "—")),
+                dialogue_suggestions=tuple(str(x) for x in sugg) if isinstance(sugg, list) else (),
+            )
 
-    # writer_notes should still exist but can be minimal in director mode; or present only in writer mode
-    mode_value = "writer" if mode == "writer" else "director"
-    req_writer = "Include writer_notes with rich content." if mode_value == "writer" else "Include writer_notes but keep it brief."
-    req_shots = "Provide 5 to 8 shots in shot_list." if mode_value == "director" else "Provide 3 to 5 shots in shot_list."
-
-    return f"""
-You are SceneSense AI. Analyze the screenplay scene and return ONLY valid JSON.
-No markdown, no code fences, no extra commentary.
-
-Mode: {mode_value}
-
-Required behavior:
-- emotion: concise (e.g., tense, intimate, hopeful, eerie)
-- narrative_purpose: one strong sentence
-- visual_mood: lighting + atmosphere in one sentence
-- camera_style: movement/framing guidance in one sentence
-- genre, tone, intensity(1-10) must be present
-- color_palette: exactly 3 items with valid HEX
-- storyboard_prompts: exactly 3 cinematic prompts
-- {req_shots}
-- confidence: 0-1
-- {req_writer}
-
-JSON schema (types guidance):
-{json.dumps(schema, indent=2)}
-
-Scene:
-{scene_text}
-""".strip()
+        return cls(
+            emotion=str(safe_get(data, "emotion", "—")).title(),
+            genre=str(safe_get(data, "genre", "—")).title(),
+            tone=str(safe_get(data, "tone", "—")).title(),
+            intensity=clamp_intensity(safe_get(data, "intensity", 5)),
+            confidence=clamp_confidence(safe_get(data, "confidence", 0.75)),
+            narrative_purpose=str(safe_get(data, "narrative_purpose", "—")),
+            visual_mood=str(safe_get(data, "visual_mood", "—")),
+            camera_style=str(safe_get(data, "camera_style", "—")),
+            palette=tuple(
+                PaletteEntry(
+                    name=str(safe_get(p, "name", "Color")),
+                    hex=normalize_hex(str(safe_get(p, "hex", "#111111"))),
+                    usage=str(safe_get(p, "usage", "")),
+                )
+                for p in palette if isinstance(p, dict)
+            ) if isinstance(palette, list) else (),
+            shots=tuple(
+                Shot(
+                    number=None if sh.get("shot_number") is None else str(sh["shot_number"]),
+                    shot_type=str(safe_get(sh, "shot_type", "Shot")),
+                    movement=str(safe_get(sh, "camera_movement", "—")),
+                    framing=str(safe_get(sh, "framing", "—")),
+                    lighting=str(safe_get(sh, "lighting", "—")),
+                    purpose=str(safe_get(sh, "purpose", "—")),
+                )
+                for sh in shots if isinstance(sh, dict)
+            ) if isinstance(shots, list) else (),
+            storyboard_prompts=tuple(str(x) for x in prompts) if isinstance(prompts, list) else (),
+            writer_notes=notes,
+        )
+
+
+# =========================
+# Response cache (disk)
+# =========================
+CACHE_DIR = Path(".scenesense_cache")
+CACHE_TTL = 86400  # seconds
 
 
-def call_groq(scene_text: str, mode: str, model: str, temperature: float = 0.4, max_tokens: int = 1200) -> Dict[str, Any]:
+def cache_key(scene_text: str, mode: str, model: str, temperature: float, max_tokens: int, summary_only: bool = False) -> str:
+    blob = json.dumps([model, mode, summary_only, round(temperature, 3), max_tokens, scene_text], sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cache_load(key: str) -> Optional[Dict[str, Any]]:
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime >= CACHE_TTL:
+            return None
+        data = json_loads(path.read_bytes())
+    except Exception:
+        return None  # missing / stale / corrupt -> treat as a miss
+    return data if isinstance(data, dict) else None
+
+
+def cache_store(key: str, data: Dict[str, Any]) -> None:
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        path = CACHE_DIR / f"{key}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(json_dump_bytes(data))
+        tmp.replace(path)
+    except Exception:
+        pass  # cache is best-effort, never break the analysis
+
+
+# =========================
+# Semantic cache (near-duplicate scenes)
+# =========================
+SEMANTIC_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.93
+_semantic_lock = threading.Lock()
+
+
+@st.cache_resource(show_spinner=False)
+def get_embedder():
+    # optional: without sentence-transformers only the exact disk cache is used
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(SEMANTIC_MODEL)
+    except Exception:
+        return None
+
+
+def semantic_namespace(
+    mode: str, model: str, temperature: float, max_tokens: int, summary_only: bool = False
+) -> str:
+    # same generation settings as cache_key, so a near-duplicate hit is only
+    # served from an answer produced under the request's own settings
+    blob = f"{mode}|{model}|{int(summary_only)}|{round(temperature, 3)}|{max_tokens}"
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def embed_scene(scene_text: str):
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+    import numpy as np
+    try:
+        return embedder.encode([scene_text], normalize_embeddings=True)[0].astype(np.float32)
+    except Exception:
+        return None
+
+
+class _SemanticIndex:
+    """
+    In-memory embeddings for one namespace, mirrored to disk as an append-only
+    float32 file + meta.jsonl (one line per row). Callers hold _semantic_lock.
+    """
+
+    __slots__ = ("dir", "dim", "embs", "hashes", "meta", "rows")
+
+    def __init__(self, d: Path, dim: int):
+        import numpy as np
+        self.dir = d
+        self.dim = dim
+        self.embs = np.zeros((16, dim), dtype=np.float32)  # grows by doubling
+        self.hashes: List[str] = []
+        self.meta: List[bytes] = []  # raw meta.jsonl lines, kept for compaction
+        self.rows: Dict[str, int] = {}  # hash -> row
+        self._load()
+
+    @property
+    def emb_path(self) -> Path:
+        return self.dir / "embeddings.f32"
+
+    @property
+    def meta_path(self) -> Path:
+        return self.dir / "meta.jsonl"
+
+    def _load(self) -> None:
+        import numpy as np
+        try:
+            size = self.emb_path.stat().st_size
+            lines = self.meta_path.read_bytes().splitlines()
+            hashes = [json_loads(line)["hash"] for line in lines]
+            n_rows = size // (self.dim * 4)
+            embs = np.fromfile(self.emb_path, dtype=np.float32, count=n_rows * self.dim).reshape(n_rows, self.dim)
+        except Exception:
+            return  # no index yet (or unreadable) -> start empty
+        n = min(n_rows, len(hashes))
+        for i in range(n):
+            if hashes[i] not in self.rows:  # older files may hold duplicates
+                self._append(embs[i], hashes[i], lines[i])
+        if len(self.hashes) != len(hashes) or n * self.dim * 4 != size:
+            self._rewrite()  # torn append or duplicates -> compact
+
+    def _rewrite(self) -> None:
+        n = len(self.hashes)
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.emb_path.with_suffix(".tmp")
+            tmp.write_bytes(self.embs[:n].tobytes())
+            tmp.replace(self.emb_path)
+            tmp = self.meta_path.with_suffix(".tmp")
+            tmp.write_bytes(b"".join(line + b"\n" for line in self.meta))
+            tmp.replace(self.meta_path)
+        except Exception:
+            pass
+
+    def _append(self, q, key: str, line: bytes) -> None:
+        import numpy as np
+        n = len(self.hashes)
+        if n == len(self.embs):
+            grown = np.zeros((2 * n, self.dim), dtype=np.float32)
+            grown[:n] = self.embs
+            self.embs = grown
+        self.embs[n] = q
+        self.hashes.append(key)
+        self.meta.append(line)
+        self.rows[key] = n
+
+    def matches(self, q, threshold: float) -> List[str]:
+        """
+        Keys with similarity above threshold, best first.
+        """
+        import numpy as np
+        n = len(self.hashes)
+        if n == 0:
+            return []
+        sims = self.embs[:n] @ q
+        hits = np.flatnonzero(sims > threshold)
+        return [self.hashes[i] for i in hits[np.argsort(-sims[hits])]]
+
+    def add(self, q, key: str, scene_text: str) -> None:
+        if key in self.rows:
+            return  # re-analysis after expiry: the row is already indexed
+        line = json_dump_bytes({"hash": key, "scene_preview": scene_text[:120]})
+        self._append(q, key, line)
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.emb_path, "ab") as f:
+                f.write(q.astype("float32").tobytes())
+            with open(self.meta_path, "ab") as f:
+                f.write(line + b"\n")
+        except Exception:
+            pass  # best-effort, same as the disk cache
+
+    def evict(self, keys: Iterable[str]) -> None:
+        drop = {self.rows[k] for k in keys if k in self.rows}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.hashes)) if i not in drop]
+        self.embs[: len(keep)] = self.embs[keep]
+        self.hashes = [self.hashes[i] for i in keep]
+        self.meta = [self.meta[i] for i in keep]
+        self.rows = {k: i for i, k in enumerate(self.hashes)}
+        self._rewrite()
+
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_index(ns: str, dim: int) -> _SemanticIndex:
+    with _semantic_lock:
+        return _SemanticIndex(CACHE_DIR / "semantic" / ns, dim)
+
+
+def semantic_lookup(q, ns: str) -> Optional[Dict[str, Any]]:
+    if q is None:
+        return None
+    index = get_semantic_index(ns, int(q.shape[0]))
+    with _semantic_lock:
+        keys = index.matches(q, SEMANTIC_THRESHOLD)
+    expired = []
+    data = None
+    for key in keys:
+        data = cache_load(key)
+        if data is not None:
+            break
+        expired.append(key)  # disk entry gone or past TTL
+    if expired:
+        with _semantic_lock:
+            index.evict(expired)
+    return data
+
+
+def semantic_store(q, ns: str, key: str, scene_text: str) -> None:
+    if q is None:
+        return
+    index = get_semantic_index(ns, int(q.shape[0]))
+    with _semantic_lock:
+        index.add(q, key, scene_text)
+
+
+# =========================
+# Groq call (LLM)
+# =========================
+BATCH_WORKERS = 8  # parallel Groq calls in Batch Mode
+
+SPEED_MAP = {
+    "instant": "llama-3.1-8b-instant",
+    "balanced": "llama-3.3-70b-versatile",
+}
+AUTO_TIER = "auto"
+ROUTE_SMALL_MAX_TOKENS = 300  # short director scenes go to the instant tier
+BATCH_TIER = "instant"  # batch is throughput-bound -> fastest tier
+BATCH_MAX_TOKENS = 300  # batch uses BATCH_SYSTEM_PROMPT (summary fields only)
+BATCH_MAX_SCENES = 12  # keep demo-safe (real-time path only)
+
+# Full-schema budget: writer mode needs ~1200 tokens; a truncated JSON-mode reply
+# is a non-retryable 400 (json_validate_failed). Batch uses BATCH_MAX_TOKENS.
+# No stop sequences: they can cut inside JSON strings and aren't supported in JSON mode.
+DEFAULT_MAX_TOKENS = 1200
+GROQ_TOP_P = 0.9
+STREAM_UPDATE_INTERVAL = 0.15  # seconds between live progress redraws
+STREAM_TAIL_CHARS = 160
+
+
+def route_tier(scene_text: str, mode: str) -> str:
+    n_tokens = len(scene_text) // 4  # rough chars -> tokens
+    return "instant" if n_tokens < ROUTE_SMALL_MAX_TOKENS and mode == "director" else "balanced"
+
+
+def resolve_model(tier: str, scene_text: str = "", mode: str = "director") -> str:
+    if tier == AUTO_TIER:
+        tier = route_tier(scene_text, mode)
+    # raw model ids pass through unchanged (used by verify_models.py)
+    return SPEED_MAP.get(tier, tier)
+
+
+@functools.cache
+def _groq_cls():
+    try:
+        from groq import Groq
+    except Exception:
+        return None  # We'll handle gracefully
+    return Groq
+
+
+@st.cache_resource(show_spinner=False)
+def get_groq_client():
+    """
+    One Groq client per Streamlit process so the HTTP connection pool
+    (and its TLS sessions) is shared across reruns and batch workers.
+    """
+    from dotenv import load_dotenv
+
     load_dotenv()
     api_key = os.getenv("GROQ_API_KEY", "").strip()
 
     if not api_key:
         raise RuntimeError("GROQ_API_KEY not found. Add it to .env (same folder as app.py).")
 
+    Groq = _groq_cls()
     if Groq is None:
         raise RuntimeError("groq package not found. Install it or adjust your client code.")
 
-    client = Groq(api_key=api_key)
+    import httpx  # installed with groq
+
+    http_client = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+    )
+    # max_retries=0: retries/backoff are handled by create_with_retry
+    return Groq(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+GROQ_MAX_ATTEMPTS = 5
+
+
+def _is_retryable(err: Exception) -> bool:
+    try:
+        from groq import APIConnectionError, APIStatusError, RateLimitError
+    except Exception:
+        return False
+    if isinstance(err, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(err, APIStatusError) and (err.status_code == 429 or err.status_code >= 500)
+
+
+def _retry_delay(attempt: int, err: Exception) -> float:
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return min(30.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(8.0, 0.5 * 2 ** attempt) + random.random() * 0.25
+
+
+def create_with_retry(client, **kwargs):
+    """
+    chat.completions.create with jittered exponential backoff on 429 / 5xx / connection errors.
+    """
+    for attempt in range(GROQ_MAX_ATTEMPTS):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt == GROQ_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                raise
+            time.sleep(_retry_delay(attempt, e))
+
+
+_SCHEMA_STR = """
+Fields (types):
+- mode: "director" or "writer" (echo the requested mode)
+- emotion: string, concise (e.g., tense, intimate, hopeful, eerie)
+- genre, tone: string
+- intensity: int 1-10
+- narrative_purpose: string, one strong sentence
+- visual_mood: string, lighting + atmosphere in one sentence
+- camera_style: string, movement/framing guidance in one sentence
+- color_palette: exactly 3 of {name, hex "#RRGGBB", usage}
+- shot_list: [{shot_number int, shot_type (Wide/Medium/Close-up/OTS/POV etc.), camera_movement, framing, lighting, purpose}]
+- storyboard_prompts: exactly 3 cinematic prompt strings
+- writer_notes: {emotional_beat, subtext, dialogue_suggestions: [string]}
+- confidence: float 0-1
+""".strip()
+
+_MODE_RULES = {
+    "director": "- Provide 5 to 8 shots in shot_list.\n- Include writer_notes but keep it brief.",
+    "writer": "- Provide 3 to 5 shots in shot_list.\n- Include writer_notes with rich content.",
+}
+
+# All invariant instructions (persona, schema, rules for both modes) in one
+# string, so every call shares the same prefix for Groq's prompt cache.
+SYSTEM_PROMPT = f"""
+You are SceneSense AI. Analyze the screenplay scene and return a JSON object.
+
+{_SCHEMA_STR}
+
+Rules for director mode:
+{_MODE_RULES["director"]}
+
+Rules for writer mode:
+{_MODE_RULES["writer"]}
+""".strip()
+
+
+# Batch table only shows these fields; asking for the full schema under the
+# batch token cap would truncate the JSON.
+BATCH_SYSTEM_PROMPT = """
+You are SceneSense AI. Analyze the screenplay scene and return a JSON object.
+
+Fields (types):
+- mode: "director" or "writer" (echo the requested mode)
+- emotion: string, concise (e.g., tense, intimate, hopeful, eerie)
+- genre, tone: string
+- intensity: int 1-10
+- confidence: float 0-1
+
+Return only these fields.
+""".strip()
+
+
+def system_prompt(summary_only: bool = False) -> str:
+    return BATCH_SYSTEM_PROMPT if summary_only else SYSTEM_PROMPT
+
+
+def build_prompt(scene_text: str, mode: str) -> str:
+    """
+    Per-request user message: just the mode selector and the scene.
+    """
+    mode_value = "writer" if mode == "writer" else "director"
+    return f'Mode: {mode_value}\n\nScene:\n"""{scene_text}"""'
+
+
+def analyze_scene(
+    scene_text: str,
+    mode: str,
+    tier: str,
+    temperature: float = 0.4,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    on_delta: Optional[Callable[[int, str], None]] = None,
+    use_cache: bool = True,
+    summary_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Cache-aware Groq call. When on_delta is given the response is streamed and
+    on_delta(n_chars, tail) is called as tokens arrive, at most every
+    STREAM_UPDATE_INTERVAL seconds plus once at the end.
+    use_cache=False always hits Groq and skips the semantic index entirely.
+    summary_only=True uses BATCH_SYSTEM_PROMPT (emotion/genre/tone/intensity/confidence).
+    """
+    scene_text = scene_text.strip()  # trailing whitespace should not miss the cache
+    model = resolve_model(tier, scene_text, mode)
+    key = cache_key(scene_text, mode, model, temperature, max_tokens, summary_only)
+    if use_cache:
+        cached = cache_load(key)
+        if cached is not None:
+            return cached
+
+    # q is None without use_cache, so lookup and store are both skipped
+    q = embed_scene(scene_text) if use_cache else None
+    ns = semantic_namespace(mode, model, temperature, max_tokens, summary_only)
+    cached = semantic_lookup(q, ns)
+    if cached is not None:
+        return cached
+
+    client = get_groq_client()
 
     prompt = build_prompt(scene_text, mode)
 
-    resp = client.chat.completions.create(
+    # JSON mode can't be combined with streaming; the streamed text is cut at the
+    # closing brace by _BraceScanner and recovered by extract_json_loose instead.
+    if on_delta is not None:
+        output_kwargs: Dict[str, Any] = {"stream": True}
+    else:
+        output_kwargs = {"response_format": {"type": "json_object"}}
+
+    resp = create_with_retry(
+        client,
         model=model,
         temperature=temperature,
         max_tokens=max_tokens,
         messages=[
-            {"role": "system", "content": "You return strict JSON only."},
+            {"role": "system", "content": system_prompt(summary_only)},
             {"role": "user", "content": prompt},
         ],
+        top_p=GROQ_TOP_P,
+        **output_kwargs,
     )
 
-    text = resp.choices[0].message.content if resp and resp.choices else ""
+    if on_delta is not None:
+        parts: List[str] = []
+        scanner = _BraceScanner()
+        n_chars = 0
+        tail = ""
+        next_update = 0.0
+        for chunk in resp:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            end = scanner.feed(delta)
+            if end >= 0:
+                delta = delta[:end]
+            parts.append(delta)
+            n_chars += len(delta)
+            tail = (tail + delta)[-STREAM_TAIL_CHARS:]
+            now = time.monotonic()
+            if now >= next_update:
+                on_delta(n_chars, tail)
+                next_update = now + STREAM_UPDATE_INTERVAL
+            if end >= 0:
+                break  # top-level object closed, ignore any trailing tokens
+        on_delta(n_chars, tail)
+        close = getattr(resp, "close", None)
+        if close is not None:
+            close()
+        text = "".join(parts)
+    else:
+        text = resp.choices[0].message.content if resp and resp.choices else ""
+
     data = extract_json_loose(text)
     if not isinstance(data, dict):
         raise RuntimeError("Model returned non-JSON or invalid JSON. Try again or reduce temperature.")
+    cache_store(key, data)
+    semantic_store(q, ns, key, scene_text)
     return data
 
 
+@st.cache_data(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def _call_groq_cached(
+    scene_text: str, mode: str, tier: str, temperature: float, max_tokens: int, summary_only: bool
+) -> Dict[str, Any]:
+    # L1: st.cache_data (in-memory, per process). L2: disk cache in analyze_scene.
+    return analyze_scene(scene_text, mode, tier, temperature, max_tokens, summary_only=summary_only)
+
+
+def call_groq(
+    scene_text: str,
+    mode: str,
+    tier: str,
+    temperature: float = 0.4,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    summary_only: bool = False,
+) -> Dict[str, Any]:
+    # strip before the L1 key so whitespace-only edits share one entry
+    return _call_groq_cached(scene_text.strip(), mode, tier, temperature, max_tokens, summary_only)
+
+
+# =========================
+# Async batch queue (Groq Batch API)
+# =========================
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_FAILED_STATUSES = ("failed", "expired", "cancelled")  # terminal, but not "completed"
+
+
+def build_batch_jsonl(scenes: List[str], mode: str, tier: str, temperature: float, max_tokens: int) -> bytes:
+    """
+    One /v1/chat/completions request per scene, same messages as
+    analyze_scene(summary_only=True).
+    """
+    model = resolve_model(tier)
+    lines = []
+    for i, sc in enumerate(scenes, start=1):
+        lines.append(json_dump_bytes({
+            "custom_id": f"scene_{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "response_format": {"type": "json_object"},
+                "top_p": GROQ_TOP_P,
+                "messages": [
+                    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": build_prompt(sc.strip(), mode)},
+                ],
+            },
+        }))
+    return b"\n".join(lines) + b"\n"
+
+
+def submit_batch_job(scenes: List[str], mode: str, tier: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+    client = get_groq_client()
+    payload = build_batch_jsonl(scenes, mode, tier, temperature, max_tokens)
+    f = client.files.create(file=("scenesense_batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=f.id,
+        endpoint="/v1/chat/completions",
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+    model = resolve_model(tier)
+    return {
+        "id": batch.id,
+        "n_scenes": len(scenes),
+        "submitted": now_stamp(),
+        # disk-cache keys so finished results also warm the response cache
+        "keys": [cache_key(sc.strip(), mode, model, temperature, max_tokens, summary_only=True) for sc in scenes],
+    }
+
+
+def _iter_batch_file(client, file_id: Optional[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yields (scene_index, item) for each line of a batch output/error file.
+    """
+    if not file_id:
+        return
+    raw = client.files.content(file_id).read().decode("utf-8", errors="ignore")
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json_loads(line)
+            yield int(str(item.get("custom_id", "")).rsplit("_", 1)[-1]), item
+        except Exception:
+            continue
+
+
+def _batch_item_error(item: Dict[str, Any]) -> Any:
+    err = item.get("error")
+    if err:
+        return err.get("message", err) if isinstance(err, dict) else err
+    response = item.get("response") or {}
+    body_err = (response.get("body") or {}).get("error")
+    if isinstance(body_err, dict):
+        return body_err.get("message", body_err)
+    return body_err or f"request failed (HTTP {response.get('status_code', '?')})"
+
+
+def poll_batch_job(job: Dict[str, Any]) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """
+    Returns (status, rows). rows is None while the batch is still running; once it
+    reaches a terminal status every scene has a row (result or error).
+    """
+    client = get_groq_client()
+    batch = client.batches.retrieve(job["id"])
+    status = str(getattr(batch, "status", "unknown"))
+    if status != "completed" and status not in BATCH_FAILED_STATUSES:
+        return status, None
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    for i, item in _iter_batch_file(client, getattr(batch, "output_file_id", None)):
+        try:
+            body = (item.get("response") or {}).get("body") or {}
+            text = body["choices"][0]["message"]["content"]
+            data = extract_json_loose(text)
+            if not isinstance(data, dict):
+                raise RuntimeError("Model returned non-JSON or invalid JSON.")
+            if 0 < i <= len(job["keys"]):
+                cache_store(job["keys"][i - 1], data)
+            by_index[i] = batch_row(i, data)
+        except Exception as e:
+            by_index[i] = batch_error_row(i, item.get("error") or e)
+    for i, item in _iter_batch_file(client, getattr(batch, "error_file_id", None)):
+        by_index.setdefault(i, batch_error_row(i, _batch_item_error(item)))
+
+    missing = "missing from batch output" if status == "completed" else f"batch {status}"
+    rows = [by_index.get(i) or batch_error_row(i, missing) for i in range(1, job["n_scenes"] + 1)]
+    return status, rows
+
+
 # =========================
 # UI building blocks
 # =========================
@@ -354,108 +1116,87 @@ def render_hero():
     st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
 
-def render_insight_cards(data: Dict[str, Any]):
-    emotion = str(safe_get(data, "emotion", "—")).title()
-    genre = str(safe_get(data, "genre", "—")).title()
-    tone = str(safe_get(data, "tone", "—")).title()
-    intensity = clamp_intensity(safe_get(data, "intensity", 5))
-    conf = clamp_confidence(safe_get(data, "confidence", 0.75))
+_HASH_ANALYSIS = {SceneAnalysis: hash}
 
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown(f"""
+
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_HASH_ANALYSIS)
+def _insight_cards_html(a: SceneAnalysis) -> Tuple[str, str, str, str]:
+    return (
+        f"""
 <div class="card">
   <h3>🎭 Emotion</h3>
-  <div class="big">{emotion}</div>
+  <div class="big">{a.emotion}</div>
   <div class="sub">Scene feeling</div>
 </div>
-""", unsafe_allow_html=True)
-    with c2:
-        st.markdown(f"""
+""",
+        f"""
 <div class="card">
   <h3>🎬 Genre</h3>
-  <div class="big">{genre}</div>
+  <div class="big">{a.genre}</div>
   <div class="sub">Story category</div>
 </div>
-""", unsafe_allow_html=True)
-    with c3:
-        st.markdown(f"""
+""",
+        f"""
 <div class="card">
   <h3>🔥 Intensity</h3>
-  <div class="big">{intensity}/10</div>
+  <div class="big">{a.intensity}/10</div>
   <div class="sub">Pace & tension</div>
 </div>
-""", unsafe_allow_html=True)
-    with c4:
-        st.markdown(f"""
+""",
+        f"""
 <div class="card">
   <h3>✅ Confidence</h3>
-  <div class="big">{int(conf*100)}%</div>
+  <div class="big">{int(a.confidence*100)}%</div>
   <div class="sub">Output reliability</div>
 </div>
-""", unsafe_allow_html=True)
+""",
+    )
 
-    st.markdown("")
 
+def render_insight_cards(a: SceneAnalysis):
+    cards = _insight_cards_html(a)
 
-def render_summary_cards(data: Dict[str, Any]):
-    purpose = str(safe_get(data, "narrative_purpose", "—"))
-    mood = str(safe_get(data, "visual_mood", "—"))
-    camera = str(safe_get(data, "camera_style", "—"))
+    for col, html in zip(st.columns(4), cards):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
 
-    a, b, c = st.columns(3)
-    with a:
+    st.markdown("")
+
+
+def render_summary_cards(a: SceneAnalysis):
+    c1, c2, c3 = st.columns(3)
+    with c1:
         st.markdown(f"""
 <div class="card">
   <h3>🎯 Narrative Purpose</h3>
-  <div class="sub">{purpose}</div>
+  <div class="sub">{a.narrative_purpose}</div>
 </div>
 """, unsafe_allow_html=True)
-    with b:
+    with c2:
         st.markdown(f"""
 <div class="card">
   <h3>🎨 Visual Mood</h3>
-  <div class="sub">{mood}</div>
+  <div class="sub">{a.visual_mood}</div>
 </div>
 """, unsafe_allow_html=True)
-    with c:
+    with c3:
         st.markdown(f"""
 <div class="card">
   <h3>🎥 Camera Style</h3>
-  <div class="sub">{camera}</div>
+  <div class="sub">{a.camera_style}</div>
 </div>
 """, unsafe_allow_html=True)
 
     st.markdown("")
 
 
-def render_palette(data: Dict[str, Any]):
-    palette = safe_get(data, "color_palette", []) or []
-    
-
-
-    if not isinstance(palette, list) or len(palette) == 0:
-        st.info("🎨 No color palette generated for this scene.")
-        return
-
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_HASH_ANALYSIS)
+def _palette_html(a: SceneAnalysis) -> List[str]:
     # Limit to 3 colors for clarity
-    palette = palette[:3]
-
-    st.markdown("## 🎨 Cinematic Color Palette")
-    st.caption("Guides lighting, mood, costume, and color grading decisions")
-
-    cols = st.columns(len(palette))
-
-    for col, p in zip(cols, palette):
-        name = str(safe_get(p, "name", "Color"))
-        hx = normalize_hex(str(safe_get(p, "hex", "#111111")))
-        usage = str(safe_get(p, "usage", ""))
-
-        with col:
-            st.markdown(
-                f"""
+    return [
+        f"""
                 <div style="
-                    background:{hx};
+                    background:{p.hex};
                     height:110px;
                     border-radius:16px;
                     box-shadow:0 8px 24px rgba(0,0,0,0.45);
@@ -463,82 +1204,84 @@ def render_palette(data: Dict[str, Any]):
                 "></div>
 
                 <div style="padding-left:4px">
-                    <strong style="font-size:16px">{name}</strong><br>
-                    <span style="opacity:0.7; font-size:13px">{hx}</span><br>
+                    <strong style="font-size:16px">{p.name}</strong><br>
+                    <span style="opacity:0.7; font-size:13px">{p.hex}</span><br>
                     <span style="font-size:13px; opacity:0.9">
-                        <b>Use:</b> {usage}
+                        <b>Use:</b> {p.usage}
                     </span>
                 </div>
-                """,
-                unsafe_allow_html=True
-            )
+                """
+        for p in a.palette[:3]
+    ]
 
 
+def render_palette(a: SceneAnalysis):
+    swatches = _palette_html(a)
+    if not swatches:
+        st.info("🎨 No color palette generated for this scene.")
+        return
 
-def render_shot_list(data: Dict[str, Any]):
-    shots = safe_get(data, "shot_list", []) or []
-    if not isinstance(shots, list) or len(shots) == 0:
+    st.markdown("## 🎨 Cinematic Color Palette")
+    st.caption("Guides lighting, mood, costume, and color grading decisions")
+
+    for col, html in zip(st.columns(len(swatches)), swatches):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=64, hash_funcs=_HASH_ANALYSIS)
+def _shot_list_html(a: SceneAnalysis) -> List[Tuple[str, str]]:
+    return [
+        (s.title, f"""
+<div class="shotrow">
+  <span class="badge">🎥 Movement: {s.movement}</span>
+  <span class="badge">🖼️ Framing: {s.framing}</span>
+  <span class="badge">💡 Lighting: {s.lighting}</span>
+  <div style="margin-top:8px; opacity:0.90;"><b>Purpose:</b> {s.purpose}</div>
+</div>
+""")
+        for s in a.shots
+    ]
+
+
+def render_shot_list(a: SceneAnalysis):
+    items = _shot_list_html(a)
+    if not items:
         st.info("No shot list returned.")
         return
 
     st.markdown("### 🎬 Shot List (Production Ready)")
 
-    for s in shots:
-        num = safe_get(s, "shot_number", None)
-        stype = str(safe_get(s, "shot_type", "Shot"))
-        move = str(safe_get(s, "camera_movement", "—"))
-        frame = str(safe_get(s, "framing", "—"))
-        light = str(safe_get(s, "lighting", "—"))
-        purpose = str(safe_get(s, "purpose", "—"))
-
-        title = f"Shot {num} — {stype}" if num is not None else f"{stype}"
+    for title, html in items:
         with st.expander(title, expanded=False):
-            st.markdown(
-                f"""
-<div class="shotrow">
-  <span class="badge">🎥 Movement: {move}</span>
-  <span class="badge">🖼️ Framing: {frame}</span>
-  <span class="badge">💡 Lighting: {light}</span>
-  <div style="margin-top:8px; opacity:0.90;"><b>Purpose:</b> {purpose}</div>
-</div>
-""",
-                unsafe_allow_html=True,
-            )
+            st.markdown(html, unsafe_allow_html=True)
 
 
-def render_storyboard_prompts(data: Dict[str, Any]):
-    prompts = safe_get(data, "storyboard_prompts", []) or []
-    if not isinstance(prompts, list) or len(prompts) == 0:
+def render_storyboard_prompts(a: SceneAnalysis):
+    if not a.storyboard_prompts:
         st.info("No storyboard prompts returned.")
         return
 
     st.markdown("### 🧩 Storyboard Prompts")
-    for i, p in enumerate(prompts[:3], start=1):
-        st.markdown(f"**Prompt {i}:** {p}")
+    st.markdown("\n\n".join(f"**Prompt {i}:** {p}" for i, p in enumerate(a.storyboard_prompts[:3], start=1)))
 
 
-def render_writer_notes(data: Dict[str, Any]):
-    wn = safe_get(data, "writer_notes", {}) or {}
-    if not isinstance(wn, dict) or len(wn) == 0:
+def render_writer_notes(a: SceneAnalysis):
+    wn = a.writer_notes
+    if wn is None:
         st.info("No writer notes returned.")
         return
 
-    beat = str(safe_get(wn, "emotional_beat", "—"))
-    sub = str(safe_get(wn, "subtext", "—"))
-    sugg = safe_get(wn, "dialogue_suggestions", []) or []
-
     st.markdown("### ✍️ Writer Notes")
-    st.success(f"**Emotional Beat**\n\n{beat}")
-    st.warning(f"**Subtext**\n\n{sub}")
+    st.success(f"**Emotional Beat**\n\n{wn.emotional_beat}")
+    st.warning(f"**Subtext**\n\n{wn.subtext}")
 
-    if isinstance(sugg, list) and sugg:
-        st.markdown("**💬 Dialogue Suggestions**")
-        for s in sugg[:8]:
-            st.write(f"• {s}")
+    if wn.dialogue_suggestions:
+        st.markdown("**💬 Dialogue Suggestions**\n\n" + "  \n".join(f"• {s}" for s in wn.dialogue_suggestions[:8]))
 
 
 def export_json_button(data: Dict[str, Any], filename_prefix: str = "scenesense_scene"):
-    payload = json.dumps(data, indent=2, ensure_ascii=False)
+    payload = json_dump_bytes(data, indent=True)
     st.download_button(
         "⬇️ Download Scene JSON",
         data=payload,
@@ -553,16 +1296,121 @@ def export_shotlist_csv(data: Dict[str, Any], filename_prefix: str = "scenesense
     if not isinstance(shots, list) or len(shots) == 0:
         st.info("No shot list available for CSV export.")
         return
-    df = pd.DataFrame(shots)
+    rows = [s if isinstance(s, dict) else {"shot": s} for s in shots]
     st.download_button(
         "⬇️ Download Shot List CSV",
-        data=df.to_csv(index=False).encode("utf-8"),
+        data=rows_to_csv_bytes(rows),
         file_name=f"{filename_prefix}_{now_stamp()}.csv",
         mime="text/csv",
         use_container_width=True,
     )
 
 
+def batch_row(i: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "scene_index": i,
+        "emotion": safe_get(data, "emotion", ""),
+        "genre": safe_get(data, "genre", ""),
+        "tone": safe_get(data, "tone", ""),
+        "intensity": clamp_intensity(safe_get(data, "intensity", 5)),
+        "confidence": clamp_confidence(safe_get(data, "confidence", 0.75)),
+    }
+
+
+def batch_error_row(i: int, err: Any) -> Dict[str, Any]:
+    return {
+        "scene_index": i,
+        "emotion": "",
+        "genre": "",
+        "tone": "",
+        "intensity": "",
+        "confidence": "",
+        "error": str(err),
+    }
+
+
+CONFIDENCE_BINS = [0.6, 0.8]
+CONFIDENCE_LABELS = ["🔴 Low", "🟡 Medium", "🟢 High"]
+INTENSITY_BINS = [4, 7]  # 1-3 / 4-6 / 7-10
+INTENSITY_LABELS = ["Low", "Medium", "High"]
+
+
+def _bucket(values, bins: List[float], labels: List[str]):
+    """
+    Vectorized binning (np.searchsorted); missing values map to "".
+    """
+    import numpy as np
+
+    x = values.to_numpy(dtype=np.float32, na_value=np.nan)
+    idx = np.searchsorted(bins, x, side="right")
+    idx[np.isnan(x)] = len(labels)
+    return np.array(labels + [""])[idx]
+
+
+def batch_dataframe(results: List[Dict[str, Any]]):
+    """
+    Column-oriented batch table with compact dtypes (nullable, so error rows stay empty).
+    """
+    import pandas as pd
+
+    def num(name: str) -> List[Any]:
+        # error rows carry "" -> <NA> in the nullable numeric dtypes
+        return [None if r.get(name, "") == "" else r[name] for r in results]
+
+    def text(name: str) -> List[Any]:
+        return [safe_get(r, name, "") for r in results]
+
+    columns = {
+        "scene_index": pd.array(num("scene_index"), dtype="Int16"),
+        "emotion": text("emotion"),
+        "genre": text("genre"),
+        "tone": text("tone"),
+        "intensity": pd.array(num("intensity"), dtype="Int8"),
+        "confidence": pd.array(num("confidence"), dtype="Float32"),
+    }
+    columns["confidence_level"] = _bucket(columns["confidence"], CONFIDENCE_BINS, CONFIDENCE_LABELS)
+    columns["intensity_level"] = _bucket(columns["intensity"], INTENSITY_BINS, INTENSITY_LABELS)
+    if any("error" in r for r in results):
+        columns["error"] = [r.get("error", "") for r in results]
+    return pd.DataFrame(columns)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def batch_export_bytes(results: List[Dict[str, Any]]) -> Tuple[bytes, bytes]:
+    # keyed on the row contents, so reruns (e.g. a polled async batch) reuse the bytes
+    return rows_to_csv_bytes(results), json_dump_bytes(results, indent=True)
+
+
+def render_batch_results(results: List[Dict[str, Any]], show_raw: bool):
+    df = batch_dataframe(results)
+    csv_bytes, json_bytes = batch_export_bytes(results)
+    st.markdown("## 📊 Batch Summary")
+    st.dataframe(df, use_container_width=True)
+
+    st.markdown("## ⬇️ Export Batch Summary")
+    e1, e2 = st.columns([1, 1])
+    with e1:
+        st.download_button(
+            "⬇️ Download Batch Summary CSV",
+            data=csv_bytes,
+            file_name=f"scenesense_batch_summary_{now_stamp()}.csv",
+            mime="text/csv",
+            use_container_width=True,
+        )
+    with e2:
+        st.download_button(
+            "⬇️ Download Batch Summary JSON",
+            data=json_bytes,
+            file_name=f"scenesense_batch_summary_{now_stamp()}.json",
+            mime="application/json",
+            use_container_width=True,
+        )
+
+    if show_raw:
+        with st.expander("📦 Raw Batch JSON (Advanced)", expanded=False):
+            st.json(results)
+
+
 # =========================
 # Sidebar controls
 # =========================
@@ -572,17 +1420,18 @@ def sidebar_controls() -> Dict[str, Any]:
     mode = "director" if "Director" in role else "writer"
 
     st.sidebar.markdown("### ⚙️ Model Settings")
-    model = st.sidebar.selectbox(
-    "Groq model",
-    options=[
-        "llama-3.1-8b-instant",
-        "mixtral-8x7b-32768",
-    ],
-    index=0,
-)
+    tier = st.sidebar.selectbox(
+        "Model tier (Single Scene)",
+        options=[AUTO_TIER] + list(SPEED_MAP.keys()),
+        index=0,
+        format_func=lambda t: "Auto — short director scenes use 8B, else 70B" if t == AUTO_TIER else f"{t.title()} — {SPEED_MAP[t]}",
+    )
+    if st.sidebar.toggle("Force large model", value=False):
+        tier = "balanced"
+    st.sidebar.caption(f"Batch Mode always uses {SPEED_MAP[BATCH_TIER]} for throughput.")
 
     temperature = st.sidebar.slider("Creativity (temperature)", 0.0, 1.0, 0.35, 0.05)
-    max_tokens = st.sidebar.slider("Max tokens", 400, 2500, 1200, 50)
+    max_tokens = st.sidebar.slider("Max tokens", 400, 2500, DEFAULT_MAX_TOKENS, 50)
 
     st.sidebar.markdown("### 🧪 Output Display")
     show_raw = st.sidebar.toggle("Show raw JSON (advanced)", value=False)
@@ -601,7 +1450,7 @@ def sidebar_controls() -> Dict[str, Any]:
 
     return {
         "mode": mode,
-        "model": model,
+        "tier": tier,
         "temperature": float(temperature),
         "max_tokens": int(max_tokens),
         "show_raw": bool(show_raw),
@@ -612,21 +1461,10 @@ def sidebar_controls() -> Dict[str, Any]:
 # =========================
 # Main App
 # =========================
-def main():
-    render_hero()
-    controls = sidebar_controls()
-
-    tab1, tab2 = st.tabs(["🎬 Single Scene", "📁 Batch Mode"])
-
-    # ---------- Single Scene ----------
-    with tab1:
-        st.markdown("## 🎛️ Scene Input")
-
-        left, right = st.columns([1, 2], gap="large")
-
-        examples = {
-            "None": "",
-            "Action Chase (High Intensity)": """EXT. MARKET STREET - NIGHT
+# module-level so the sample scenes are built once, not on every rerun
+EXAMPLE_SCENES = {
+    "None": "",
+    "Action Chase (High Intensity)": """EXT. MARKET STREET - NIGHT
 
 A motorbike roars through crowded stalls. People scream and jump aside.
 Ravi grips the handlebar, dodging carts and neon signs.
@@ -638,7 +1476,7 @@ RAVI (yelling): They're still on me!
 A shot rings out. Glass shatters above him.
 Ravi swerves into a narrow alley. Sparks fly as the bike scrapes the wall.
 """,
-            "Tension Thriller (Warehouse)": """INT. ABANDONED WAREHOUSE - NIGHT
+    "Tension Thriller (Warehouse)": """INT. ABANDONED WAREHOUSE - NIGHT
 
 The metal door creaks open. Riya steps inside, holding her phone like a torch.
 Water drips from the ceiling. Somewhere deep in the dark — a faint CLICK.
@@ -651,7 +1489,7 @@ RIYA: Hello...?
 
 Silence. Then— a slow FOOTSTEP, closer this time.
 """,
-            "Romance (Sunset Bench)": """EXT. PARK - SUNSET
+    "Romance (Sunset Bench)": """EXT. PARK - SUNSET
 
 Golden light spills through the trees. Aarav and Meera sit on a bench, shoulders almost touching.
 
@@ -661,7 +1499,7 @@ AARAV: I thought it was easier... than saying goodbye.
 Meera turns. Her eyes shine. She reaches for his hand. He lets her.
 The city noise fades, leaving only the wind and their breathing.
 """,
-            "Horror (Mirror)": """INT. APARTMENT BATHROOM - 2:13 AM
+    "Horror (Mirror)": """INT. APARTMENT BATHROOM - 2:13 AM
 
 Only the mirror light hums. Ananya washes her face, trying to calm down.
 She looks up.
@@ -675,16 +1513,30 @@ Ananya’s real hand doesn’t move.
 
 The bathroom door behind her clicks shut by itself.
 """,
-        }
+}
+
+
+def main():
+    setup_page()
+    render_hero()
+    controls = sidebar_controls()
+
+    tab1, tab2 = st.tabs(["🎬 Single Scene", "📁 Batch Mode"])
+
+    # ---------- Single Scene ----------
+    with tab1:
+        st.markdown("## 🎛️ Scene Input")
+
+        left, right = st.columns([1, 2], gap="large")
 
         with left:
             st.markdown("**Role**")
             role_label = "🎥 Director Mode" if controls["mode"] == "director" else "✍️ Writer Mode"
             st.info(f"Selected: **{role_label}**")
 
-            ex = st.selectbox("Load example (optional)", list(examples.keys()), index=0)
+            ex = st.selectbox("Load example (optional)", list(EXAMPLE_SCENES.keys()), index=0)
             if st.button("✨ Load Example", use_container_width=True):
-                st.session_state["scene_text"] = examples[ex]
+                st.session_state["scene_text"] = EXAMPLE_SCENES[ex]
 
             st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
             st.caption("Pro tip: In demo, use “Warehouse” or “Mirror” scenes for the most cinematic output.")
@@ -704,27 +1556,37 @@ The bathroom door behind her clicks shut by itself.
                 st.warning("Please paste a longer scene (at least ~30 characters).")
                 return
 
-            with st.spinner("Analyzing scene… generating cinematic plan ✨"):
-                t0 = time.time()
-                try:
-                    data = call_groq(
-                        scene_text=scene_text.strip(),
-                        mode=controls["mode"],
-                        model=controls["model"],
-                        temperature=controls["temperature"],
-                        max_tokens=controls["max_tokens"],
-                    )
-                except Exception as e:
-                    st.error(f"LLM call failed: {e}")
-                    return
-                dt = time.time() - t0
+            live = st.empty()
+            live.info("Analyzing scene… generating cinematic plan ✨")
+
+            def show_progress(n_chars: int, tail: str):
+                tail = tail.replace("\n", " ").replace("`", "'")
+                live.info(f"✨ Generating… ~{n_chars // 4} tokens\n\n`{tail}`")
+
+            t0 = time.time()
+            try:
+                data = analyze_scene(
+                    scene_text=scene_text.strip(),
+                    mode=controls["mode"],
+                    tier=controls["tier"],
+                    temperature=controls["temperature"],
+                    max_tokens=controls["max_tokens"],
+                    on_delta=show_progress,
+                )
+            except Exception as e:
+                live.empty()
+                st.error(f"LLM call failed: {e}")
+                return
+            dt = time.time() - t0
+            live.empty()
 
             st.success(f"✅ Analysis complete in {dt:.2f}s")
+            analysis = SceneAnalysis.from_raw(data)
             st.markdown("## 🔍 Scene Insight")
-            render_insight_cards(data)
+            render_insight_cards(analysis)
 
             st.markdown("## 🎞️ Cinematic Summary")
-            render_summary_cards(data)
+            render_summary_cards(analysis)
 
             st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
@@ -732,21 +1594,21 @@ The bathroom door behind her clicks shut by itself.
             if controls["mode"] == "director":
                 left2, right2 = st.columns([1.1, 1], gap="large")
                 with left2:
-                    render_shot_list(data)
+                    render_shot_list(analysis)
                 with right2:
-                    render_palette(data)
+                    render_palette(analysis)
                     st.markdown("")
-                    render_storyboard_prompts(data)
+                    render_storyboard_prompts(analysis)
             else:
                 left2, right2 = st.columns([1, 1], gap="large")
                 with left2:
-                    render_writer_notes(data)
+                    render_writer_notes(analysis)
                 with right2:
-                    render_palette(data)
+                    render_palette(analysis)
                     st.markdown("")
-                    render_storyboard_prompts(data)
+                    render_storyboard_prompts(analysis)
                     st.markdown("")
-                    render_shot_list(data)  # still useful for writers too
+                    render_shot_list(analysis)  # still useful for writers too
 
             st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
 
@@ -771,6 +1633,11 @@ The bathroom door behind her clicks shut by itself.
         st.write("Upload a `.txt` script. The app will split it into scenes and analyze each scene (lightweight batch).")
 
         up = st.file_uploader("Upload script (.txt)", type=["txt"])
+        use_queue = st.toggle(
+            "Batch via async queue (large scripts)",
+            value=False,
+            help="Submits every scene to the Groq Batch API (no scene cap, lower cost). Results arrive asynchronously.",
+        )
         batch_run = st.button("🚀 Run Batch Analysis", type="primary", use_container_width=True)
 
         if batch_run:
@@ -778,65 +1645,95 @@ The bathroom door behind her clicks shut by itself.
                 st.warning("Please upload a .txt file first.")
                 return
 
-            script_text = up.read().decode("utf-8", errors="ignore")
-            scenes = scene_splitter(script_text)
+            # the real-time path is capped, so stop scanning once enough scenes are found
+            scenes = split_script_cached(up.getvalue(), None if use_queue else BATCH_MAX_SCENES)
 
             if not scenes:
                 st.warning("No scenes detected. Ensure the script has content.")
                 return
 
-            st.success(f"✅ Detected {len(scenes)} scene(s). Starting batch analysis…")
-            max_scenes = 12  # keep demo-safe
-            scenes = scenes[:max_scenes]
-
-            results = []
-            progress = st.progress(0)
-            for i, sc in enumerate(scenes, start=1):
+            if use_queue:
                 try:
-                    data = call_groq(
-                        scene_text=sc,
-                        mode=controls["mode"],
-                        model=controls["model"],
-                        temperature=controls["temperature"],
-                        max_tokens=controls["max_tokens"],
-                    )
-                    results.append({
-                        "scene_index": i,
-                        "emotion": safe_get(data, "emotion", ""),
-                        "genre": safe_get(data, "genre", ""),
-                        "tone": safe_get(data, "tone", ""),
-                        "intensity": clamp_intensity(safe_get(data, "intensity", 5)),
-                        "confidence": clamp_confidence(safe_get(data, "confidence", 0.75)),
-                    })
+                    job = submit_batch_job(scenes, controls["mode"], BATCH_TIER, controls["temperature"], BATCH_MAX_TOKENS)
                 except Exception as e:
-                    results.append({
-                        "scene_index": i,
-                        "emotion": "",
-                        "genre": "",
-                        "tone": "",
-                        "intensity": "",
-                        "confidence": "",
-                        "error": str(e),
-                    })
-
-                progress.progress(int(i / len(scenes) * 100))
-
-            df = pd.DataFrame(results)
-            st.markdown("## 📊 Batch Summary")
-            st.dataframe(df, use_container_width=True)
-
-            st.markdown("## ⬇️ Export Batch Summary")
-            st.download_button(
-                "⬇️ Download Batch Summary CSV",
-                data=df.to_csv(index=False).encode("utf-8"),
-                file_name=f"scenesense_batch_summary_{now_stamp()}.csv",
-                mime="text/csv",
-                use_container_width=True,
-            )
-
-            if controls["show_raw"]:
-                with st.expander("📦 Raw Batch JSON (Advanced)", expanded=False):
-                    st.json(results)
+                    st.error(f"Batch submission failed: {e}")
+                    return
+                st.session_state["batch_job"] = job
+                st.session_state.pop("batch_rows", None)
+                st.success(f"✅ Queued {len(scenes)} scene(s) as batch `{job['id']}`. Check back for results.")
+            else:
+                st.success(f"✅ Analyzing {len(scenes)} scene(s) (real-time cap: {BATCH_MAX_SCENES}). Starting batch analysis…")
+
+                # identical scenes (repeated transitions, pasted twice) hit the LLM once
+                # (in-memory only, so a short blake2b digest is enough)
+                order: List[bytes] = []
+                by_hash: Dict[bytes, str] = {}
+                for sc in scenes:
+                    h = hashlib.blake2b(sc.strip().encode("utf-8"), digest_size=16).digest()
+                    order.append(h)
+                    by_hash.setdefault(h, sc)
+
+                outcome_by_hash: Dict[bytes, Any] = {}
+                progress = st.progress(0)
+                with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(by_hash))) as ex:
+                    futures = {
+                        ex.submit(
+                            call_groq,
+                            sc,
+                            controls["mode"],
+                            BATCH_TIER,
+                            controls["temperature"],
+                            BATCH_MAX_TOKENS,
+                            True,  # summary_only
+                        ): h
+                        for h, sc in by_hash.items()
+                    }
+                    for done, fut in enumerate(as_completed(futures), start=1):
+                        try:
+                            outcome_by_hash[futures[fut]] = fut.result()
+                        except Exception as e:
+                            outcome_by_hash[futures[fut]] = e
+
+                        progress.progress(int(done / len(futures) * 100))
+
+                results = []
+                for i, h in enumerate(order, start=1):
+                    outcome = outcome_by_hash[h]
+                    if isinstance(outcome, Exception):
+                        results.append(batch_error_row(i, outcome))
+                    else:
+                        results.append(batch_row(i, outcome))
+
+                render_batch_results(results, controls["show_raw"])
+
+        job = st.session_state.get("batch_job")
+        if job:
+            st.markdown('<div class="hr"></div>', unsafe_allow_html=True)
+            st.markdown(f"### ⏳ Queued batch `{job['id']}` — {job['n_scenes']} scene(s), submitted {job['submitted']}")
+            c1, c2 = st.columns([1, 1])
+            with c1:
+                check = st.button("🔄 Check batch status", use_container_width=True)
+            with c2:
+                if st.button("🗑️ Forget this batch", use_container_width=True):
+                    st.session_state.pop("batch_job", None)
+                    st.session_state.pop("batch_rows", None)
+                    st.rerun()
+
+            if check:
+                try:
+                    status, rows = poll_batch_job(job)
+                except Exception as e:
+                    st.error(f"Batch status check failed: {e}")
+                else:
+                    if status in BATCH_FAILED_STATUSES:
+                        st.error(f"Batch ended with status **{status}** — finished scenes (if any) are shown below.")
+                    else:
+                        st.info(f"Status: **{status}**")
+                    if rows is not None:
+                        st.session_state["batch_rows"] = rows
+
+            if st.session_state.get("batch_rows"):
+                render_batch_results(st.session_state["batch_rows"], controls["show_raw"])
 
     st.markdown("---")
     st.markdown(
@@ -2,12 +2,14 @@
 import os
 import json
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Add parent dir to sys.path to import app
-sys.path.append(os.path.abspath("scene-intent-engine"))
+# Make app.py importable regardless of the current working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import call_groq
+from app import analyze_scene
 
 load_dotenv()
 
@@ -19,37 +21,45 @@ Water drips from the ceiling. Somewhere deep in the dark — a faint CLICK.
 She freezes.
 """
 
+_print_lock = threading.Lock()
+
+
 def test_model(model_name):
-    print(f"\n--- Testing {model_name} ---")
+    # Buffer output and print it in one block so concurrent runs don't interleave
+    out = [f"\n--- Testing {model_name} ---"]
     try:
-        data = call_groq(SCENE, "director", model_name, temperature=0.1, max_tokens=1000)
-        print("KEYS:", list(data.keys()))
+        # use_cache=False: this checks live model output, never a cached answer
+        data = analyze_scene(SCENE, "director", model_name, temperature=0.1, max_tokens=1000, use_cache=False)
+        out.append(f"KEYS: {list(data.keys())}")
         
         if "shot_list" in data:
-            print(f"SHOTS: {len(data['shot_list'])} found.")
+            out.append(f"SHOTS: {len(data['shot_list'])} found.")
             if len(data['shot_list']) > 0:
-                print("SAMPLE SHOT:", data['shot_list'][0])
+                out.append(f"SAMPLE SHOT: {data['shot_list'][0]}")
         else:
-            print("❌ MISSING shot_list")
+            out.append("❌ MISSING shot_list")
 
         if "color_palette" in data:
-             print(f"PALETTE: {len(data['color_palette'])} colors.")
+             out.append(f"PALETTE: {len(data['color_palette'])} colors.")
         else:
-             print("❌ MISSING color_palette")
+             out.append("❌ MISSING color_palette")
              
         return data
     except Exception as e:
-        print(f"❌ ERROR: {e}")
+        out.append(f"❌ ERROR: {e}")
         return None
+    finally:
+        with _print_lock:
+            print("\n".join(out))
 
 if __name__ == "__main__":
     print("Starting verification...")
     
-    # 1. Test Groq 8B
-    res_8b = test_model("llama-3.1-8b-instant")
-    
-    # 2. Test Qubrid 70B
-    res_70b = test_model("llama-3.3-70b-versatile")
+    # Test Groq 8B and Qubrid 70B concurrently (independent network calls)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_8b = ex.submit(test_model, "llama-3.1-8b-instant")
+        fut_70b = ex.submit(test_model, "llama-3.3-70b-versatile")
+        res_8b, res_70b = fut_8b.result(), fut_70b.result()
     
     
     # Save outputs for inspection